@@ -1,13 +1,20 @@
 import eel
 import os
 import sys
+import asyncio
 import subprocess
 import webbrowser
 import requests
+from requests.adapters import HTTPAdapter
 import google.generativeai as genai
 import mysql.connector
 from config_manager import ConfigManager
 
+# Shared HTTP session: repeated validations reuse the TLS connection
+# instead of paying a fresh handshake per Settings check.
+_HTTP = requests.Session()
+_HTTP.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4))
+
 # Handle "Engine Mode" for standalone EXE
 if "--engine" in sys.argv:
     try:
@@ -23,6 +30,18 @@ eel.init('web')
 # GLOBAL STATE
 bot_process = None
 
+# Dedicated loop for managing the engine subprocess without blocking
+# the Eel-exposed callbacks on pipe reads.
+_ENGINE_LOOP = asyncio.new_event_loop()
+
+async def _launch_engine():
+    return await asyncio.create_subprocess_exec(
+        sys.executable, "--engine",
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+        creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+    )
+
 # --- Python API exposed to JS ---
 
 @eel.expose
@@ -30,12 +49,7 @@ def open_url(url):
     webbrowser.open(url)
     return True
 
-@eel.expose
-def validate_full_config():
-    config = ConfigManager.load_config()
-    errors = []
-    
-    # 1. Check MySQL
+def _check_mysql(config):
     try:
         conn = mysql.connector.connect(
             host=config.get('MYSQL_HOST', 'localhost'),
@@ -48,34 +62,51 @@ def validate_full_config():
         if conn.is_connected():
             conn.close()
         else:
-            errors.append("Database: Connection failed (is MySQL running?)")
+            return "Database: Connection failed (is MySQL running?)"
     except Exception as e:
-        errors.append(f"Database: {str(e)}")
+        return f"Database: {str(e)}"
+    return None
 
-    # 2. Check Gemini
+def _check_gemini(config):
     gemini_key = config.get('GEMINI_API_KEY')
     if not gemini_key:
-        errors.append("Gemini: API Key is missing in Settings.")
-    else:
-        try:
-            genai.configure(api_key=gemini_key)
-            # Try to list models as a lightweight check
-            genai.list_models()
-        except Exception as e:
-            errors.append(f"Gemini: Invalid API Key or Network issue ({str(e)})")
+        return "Gemini: API Key is missing in Settings."
+    try:
+        genai.configure(api_key=gemini_key)
+        # Try to list models as a lightweight check
+        genai.list_models()
+    except Exception as e:
+        return f"Gemini: Invalid API Key or Network issue ({str(e)})"
+    return None
 
-    # 3. Check Telegram
+def _check_telegram(config):
     bot_token = config.get('TELEGRAM_BOT_TOKEN')
     if not bot_token:
-        errors.append("Telegram: Bot Token is missing in Settings.")
-    else:
-        try:
-            t_url = f"https://api.telegram.org/bot{bot_token}/getMe"
-            resp = requests.get(t_url, timeout=5).json()
-            if not resp.get('ok'):
-                errors.append(f"Telegram: {resp.get('description', 'Invalid token')}")
-        except Exception as e:
-            errors.append("Telegram: Could not connect to API (Check internet)")
+        return "Telegram: Bot Token is missing in Settings."
+    try:
+        t_url = f"https://api.telegram.org/bot{bot_token}/getMe"
+        resp = _HTTP.get(t_url, timeout=(2, 5)).json()
+        if not resp.get('ok'):
+            return f"Telegram: {resp.get('description', 'Invalid token')}"
+    except Exception:
+        return "Telegram: Could not connect to API (Check internet)"
+    return None
+
+@eel.expose
+def validate_full_config():
+    config = ConfigManager.load_config()
+
+    # The three probes are independent network calls; run them concurrently
+    # so total wall time is max(timeouts) instead of their sum (~13s worst case).
+    async def _run_all():
+        return await asyncio.gather(
+            asyncio.to_thread(_check_mysql, config),
+            asyncio.to_thread(_check_gemini, config),
+            asyncio.to_thread(_check_telegram, config),
+        )
+
+    results = asyncio.run(_run_all())
+    errors = [r for r in results if r is not None]
 
     return {
         "success": len(errors) == 0,
@@ -88,19 +119,15 @@ def get_config():
 
 @eel.expose
 def save_config(new_keys):
-    config = ConfigManager.load_config()
-    config.update(new_keys)
-    ConfigManager.save_config(config)
+    ConfigManager.update_config(new_keys)
     return True
 
 @eel.expose
 def test_db(db_data):
     try:
         # Save current inputs first to be safe
-        config = ConfigManager.load_config()
-        config.update(db_data)
-        ConfigManager.save_config(config)
-        
+        ConfigManager.update_config(db_data)
+
         conn = mysql.connector.connect(
             host=db_data['MYSQL_HOST'],
             user=db_data['MYSQL_USER'],
@@ -122,19 +149,19 @@ def toggle_bot():
     if bot_process is None:
         # Start the bot engine
         try:
-            bot_process = subprocess.Popen(
-                [sys.executable, "--engine"],
-                stdout=None,
-                stderr=None,
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
+            bot_process = _ENGINE_LOOP.run_until_complete(_launch_engine())
             return True
         except Exception as e:
             print(f"Failed to start engine: {e}")
             return False
     else:
-        # Stop the bot engine
+        # Stop the bot engine: ask politely, escalate after 5s.
         bot_process.terminate()
+        try:
+            _ENGINE_LOOP.run_until_complete(asyncio.wait_for(bot_process.wait(), timeout=5))
+        except asyncio.TimeoutError:
+            bot_process.kill()
+            _ENGINE_LOOP.run_until_complete(bot_process.wait())
         bot_process = None
         return True
 
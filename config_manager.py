@@ -1,25 +1,64 @@
-import json
 import os
 
+# orjson is ~5-10x faster than stdlib json; fall back silently when it
+# isn't installed.
+try:
+    import orjson
+    _loads = orjson.loads
+    def _dumps(data):
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+except ImportError:
+    import json
+    _loads = json.loads
+    def _dumps(data):
+        return json.dumps(data, indent=4).encode()
+
 CONFIG_FILE = "config.json"
 
 class ConfigManager:
-    @staticmethod
-    def load_config():
-        """Load configuration from JSON file."""
-        if os.path.exists(CONFIG_FILE):
-            try:
-                with open(CONFIG_FILE, "r") as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
+    # Parsed-config cache, invalidated when config.json's mtime changes.
+    # Avoids a stat+read+parse on every exposed UI call.
+    _cache = None
+    _cache_mtime = 0
 
-    @staticmethod
-    def save_config(config_data):
-        """Save configuration to JSON file."""
-        with open(CONFIG_FILE, "w") as f:
-            json.dump(config_data, f, indent=4)
+    @classmethod
+    def load_config(cls):
+        """Load configuration from JSON file (cached on file mtime)."""
+        try:
+            st = os.stat(CONFIG_FILE)
+        except OSError:
+            return {}
+        if cls._cache is not None and st.st_mtime_ns == cls._cache_mtime:
+            return cls._cache.copy()
+        try:
+            with open(CONFIG_FILE, "rb") as f:
+                cls._cache = _loads(f.read())
+        except:
+            return {}
+        cls._cache_mtime = st.st_mtime_ns
+        return cls._cache.copy()
+
+    @classmethod
+    def save_config(cls, config_data):
+        """Save configuration to JSON file (atomic replace)."""
+        # Write to a sibling temp file and rename over the original, so a
+        # crash mid-write can never leave a half-written config.json.
+        tmp = CONFIG_FILE + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_dumps(config_data))
+        os.replace(tmp, CONFIG_FILE)
+        # Refresh the cache from the file we just wrote so the next
+        # load_config doesn't have to re-read it.
+        cls._cache = dict(config_data)
+        cls._cache_mtime = os.stat(CONFIG_FILE).st_mtime_ns
+
+    @classmethod
+    def update_config(cls, new_keys):
+        """Merge new_keys into the stored config in one load+save."""
+        config = cls.load_config()
+        config.update(new_keys)
+        cls.save_config(config)
+        return config
 
     @staticmethod
     def get_setting(key, default=None):
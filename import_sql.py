@@ -4,9 +4,47 @@ import os
 import re
 from dotenv import load_dotenv
 
+# Consecutive single-row INSERTs for the same table are merged into one
+# multi-row INSERT of up to this many rows before hitting the server.
+BATCH_ROWS = 1000
+
+_INSERT_RE = re.compile(r"INSERT INTO\s+(`?\w+`?)\s+VALUES\s*", re.IGNORECASE)
+
+# Strips block comments (including MySQL /*!NNNNN ... */ conditionals,
+# which the old per-statement skip dropped too) and whole-line -- comments
+# in one pass, so the execution loop only ever sees real statements.
+_COMMENT_RE = re.compile(r"/\*.*?\*/|^\s*--[^\n]*$", re.DOTALL | re.MULTILINE)
+
+def iter_statements(text):
+    """Yield SQL statements, splitting on semicolons outside string literals.
+
+    Single forward pass tracking quote state and backslash escapes — O(n)
+    regardless of input, unlike a lookahead-based regex split which can
+    backtrack badly on large dumps.
+    """
+    start = 0
+    quote = None
+    escaped = False
+    for i, ch in enumerate(text):
+        if escaped:
+            escaped = False
+        elif quote:
+            if ch == '\\':
+                escaped = True
+            elif ch == quote:
+                quote = None
+        elif ch == "'" or ch == '"':
+            quote = ch
+        elif ch == ';':
+            yield text[start:i]
+            start = i + 1
+    tail = text[start:]
+    if tail.strip():
+        yield tail
+
 def import_sql_file(filename):
     load_dotenv()
-    
+
     config = {
         'host': os.getenv('MYSQL_HOST', 'localhost'),
         'port': int(os.getenv('MYSQL_PORT', 3306)),
@@ -14,28 +52,56 @@ def import_sql_file(filename):
         'password': os.getenv('MYSQL_PASSWORD'),
         'database': os.getenv('MYSQL_DATABASE', 'ai_demo')
     }
-    
+
     print(f"Connecting to {config['database']}...")
     try:
         conn = mysql.connector.connect(**config)
         cursor = conn.cursor()
-        
+
         print(f"Reading {filename}...")
         with open(filename, 'r', encoding='utf-8') as f:
             sql_file = f.read()
-            
-        # Split by semicolon, but handle cases where semicolon might be in strings
-        # This is a basic split, but for standard SQL dumps it usually works
-        # If it fails, we'd need a more complex regex or parser
-        commands = re.split(r';(?=(?:[^\']|\'[^\']*\')*$)', sql_file)
-        
-        print(f"Executing {len(commands)} SQL commands...")
+
+        sql_file = _COMMENT_RE.sub("", sql_file)
+
+        # Bulk-load friendly session: one big transaction, no per-row
+        # constraint checks. Restored below before the final commit.
+        cursor.execute("SET autocommit=0, unique_checks=0, foreign_key_checks=0")
+
+        print("Executing SQL commands...")
         count = 0
-        for command in commands:
+        pending_table = None
+        pending_rows = []
+
+        def flush_inserts():
+            nonlocal count
+            if not pending_rows:
+                return
+            stmt = f"INSERT INTO {pending_table} VALUES " + ",".join(pending_rows)
+            try:
+                cursor.execute(stmt)
+                count += len(pending_rows)
+            except Exception as e:
+                print(f"Error inserting batch into {pending_table}: {e}")
+            pending_rows.clear()
+
+        for command in iter_statements(sql_file):
             cmd = command.strip()
-            if not cmd or cmd.startswith('--') or cmd.startswith('/*'):
+            if not cmd:
                 continue
-                
+
+            m = _INSERT_RE.match(cmd)
+            if m:
+                table = m.group(1)
+                if table != pending_table:
+                    flush_inserts()
+                    pending_table = table
+                pending_rows.append(cmd[m.end():])
+                if len(pending_rows) >= BATCH_ROWS:
+                    flush_inserts()
+                continue
+
+            flush_inserts()
             try:
                 cursor.execute(cmd)
                 count += 1
@@ -44,12 +110,14 @@ def import_sql_file(filename):
             except Exception as e:
                 print(f"Error executing command: {cmd[:50]}...")
                 print(f"Error: {e}")
-                
+
+        flush_inserts()
+        cursor.execute("SET unique_checks=1, foreign_key_checks=1")
         conn.commit()
         print(f"Successfully executed {count} commands!")
         conn.close()
         return True
-        
+
     except Exception as e:
         print(f"Connection failed: {e}")
         return False
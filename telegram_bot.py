@@ -5,29 +5,72 @@ Integrates with Google Gemini AI and MySQL database to answer business queries.
 """
 
 import os
+import asyncio
 import logging
 import json
+
+# Dispatch decisions are small JSON payloads parsed on every message;
+# prefer orjson's C parser when available.
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Fuzzy whitelist scoring: RapidFuzz computes the ratio in C; difflib's
+# pure-Python SequenceMatcher covers installs without it.
+try:
+    from rapidfuzz import fuzz as _rf_fuzz
+
+    def _similarity(a: str, b: str) -> float:
+        return _rf_fuzz.ratio(a, b) / 100.0
+except ImportError:
+    def _similarity(a: str, b: str) -> float:
+        return difflib.SequenceMatcher(None, a, b).ratio()
+import re
 import time
 import html
 import io
 import random
 import pathlib
+import difflib
+import hashlib
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 from dotenv import load_dotenv
 
 # Charting and Reports
+import threading
 import matplotlib.pyplot as plt
 import pandas as pd
 import matplotlib
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from fpdf import FPDF
 # Use a non-interactive backend for Matplotlib to work in threads/background
 matplotlib.use('Agg')
 
+# One reusable Figure/canvas pair (OO API, no pyplot global registry).
+# Matplotlib isn't thread-safe, so chart rendering holds the lock.
+_FIG = Figure(figsize=(10, 6))
+_CANVAS = FigureCanvasAgg(_FIG)
+_AX = _FIG.add_subplot(111)
+_FIG_LOCK = threading.Lock()
+
 # Network and Utilities
-import requests
+import httpx
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
+# Shared async HTTP client (httpx ships with python-telegram-bot): weather
+# and currency lookups await on it instead of blocking the event loop,
+# with keep-alive across calls.
+_HTTP = httpx.AsyncClient(
+    timeout=5,
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+)
+
 # Telegram imports
 from telegram import Update
 from telegram.ext import (
@@ -37,6 +80,22 @@ from telegram.ext import (
     filters,
     ContextTypes,
 )
+from telegram.request import HTTPXRequest
+
+
+class ORJSONRequest(HTTPXRequest):
+    """HTTPXRequest that decodes Telegram API payloads with orjson.
+
+    Every update and API response passes through parse_json_payload; with
+    orjson installed that's a C parse, with the stock parser kept as the
+    fallback for its error handling.
+    """
+
+    def parse_json_payload(self, payload: bytes):
+        try:
+            return _json_loads(payload)
+        except Exception:
+            return super().parse_json_payload(payload)
 
 # AI Engine imports
 import google.generativeai as genai
@@ -45,6 +104,7 @@ from config_manager import ConfigManager
 # Database imports
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.pooling import MySQLConnectionPool
 
 # Load environment variables (fallback)
 load_dotenv()
@@ -71,110 +131,265 @@ MYSQL_CONFIG = {
     'database': config.get('MYSQL_DATABASE', os.getenv('MYSQL_DATABASE', 'ai_demo'))
 }
 
+# Shared connection pool: a fresh TCP + auth handshake per query dominates
+# latency for the small queries this bot runs. Connections are checked out
+# with POOL.get_connection() and returned to the pool on close().
+POOL = MySQLConnectionPool(
+    pool_name="jhandoo",
+    pool_size=int(config.get('MYSQL_POOL_SIZE', os.getenv("MYSQL_POOL_SIZE", 8))),
+    pool_reset_session=True,
+    **MYSQL_CONFIG
+)
+
+@contextmanager
+def _conn():
+    """Check a connection out of the pool; close() returns it on exit."""
+    connection = POOL.get_connection()
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
 print("CRITICAL DEBUG: ANALYST IQ ENGINE (v5.0) IS RUNNING")
 # Initialize Gemini AI
 logger.info("Initializing Gemini AI with model: gemini-2.0-flash")
-genai.configure(api_key=GEMINI_API_KEY)
+# gRPC transport keeps one channel alive across calls instead of paying
+# a TLS handshake per generate_content.
+genai.configure(api_key=GEMINI_API_KEY, transport='grpc')
 model = genai.GenerativeModel('gemini-2.0-flash')
 
 
+# Static prefix of the dispatch prompt. Kept byte-identical across calls
+# (no interpolation) so Gemini's implicit prompt cache can reuse the
+# prefill; the moving parts (time, history, message) are appended after it.
+STATIC_DISPATCH_PREAMBLE = """You are 'AnalystIQ', a sophisticated AI Co-Pilot for Business Operations, modeled after the 'Antigravity' architect persona.
+
+Your Persona:
+1. Master Strategist: You don't just answer; you architect success. Provide deep, multi-layered insights that look beyond just the raw data.
+2. Expert & Authoritative: Your tone is professional, sophisticated, and highly confident. You are a senior partner in the business.
+3. Proactive Visionary: Anticipate the next three moves. If a user asks for sales, explain the trend and suggest a visualization OR a strategic report.
+4. Outcome-Driven: Minimize technical friction. Focus entirely on boardroom-ready results and executive value.
+
+Available Tools:
+1. query_database: For ALL data questions, including charts, graphs, or visual trends.
+2. set_reminder: For setting alerts. Requires 'time' (YYYY-MM-DD HH:MM:SS) and 'message'.
+3. get_weather: For weather info. Requires 'city'.
+4. convert_currency: For exchange rates. Requires 'amount', 'from', 'to'.
+5. generate_pdf: ONLY for exporting data to a downloadable PDF document/report.
+6. chit_chat: For greetings or non-task talk.
+
+Constraint: A request for a "chart", "graph", or "plot" should go to 'query_database' UNLESS the user explicitly says "PDF" or "Report".
+
+Respond ONLY with a JSON object:
+{
+  "tool": "tool_name",
+  "parameters": {...},
+  "thought": "your expert strategic reasoning, anticipating multiple future needs based on full context",
+  "transcription": "If user provided audio, include the text here",
+  "sql": "For query_database/generate_pdf ONLY: the MySQL query answering the question, using ONLY tables and columns from the schema below. Omit this key if unsure."
+}"""
+
+# Trivial greetings routed straight to chit_chat without an LLM round-trip.
+_GREETING_RE = re.compile(r'(hi|hello|hey|hola|namaste|yo)[!,. ]*$', re.IGNORECASE)
+
+# Unambiguous command shapes with their parameters in-line; matching one
+# of these resolves the tool and its parameters without Gemini.
+_CURRENCY_RE = re.compile(
+    r'convert\s+(\d+(?:\.\d+)?)\s+([A-Za-z]{3})\s+(?:to|in)\s+([A-Za-z]{3})[?!. ]*$', re.IGNORECASE)
+_WEATHER_RE = re.compile(
+    r'weather\s+(?:in\s+|for\s+)?([A-Za-z][A-Za-z ]*?)[?!. ]*$', re.IGNORECASE)
+
+# Statement roots execute_query is allowed to run. Gemini occasionally
+# emits DML/DDL (including DROP); reject those locally before they ever
+# reach MySQL.
+_SAFE_SQL_RE = re.compile(r"^\s*(SELECT|SHOW|DESCRIBE|EXPLAIN|WITH)\b", re.IGNORECASE)
+
+# Hard cap on rows fetched per query. Only ~15 rows are ever rendered, so
+# an unbounded "select * from big_table" would transfer and hold the whole
+# table for nothing.
+MAX_RESULT_ROWS = 500
+
+_LIMIT_RE = re.compile(r"\bLIMIT\s+\d+", re.IGNORECASE)
+_AGG_RE = re.compile(r"\b(COUNT|SUM|AVG|MIN|MAX)\s*\(", re.IGNORECASE)
+
+
+def _enforce_row_limit(sql_query: str) -> str:
+    """Append a LIMIT to unbounded, non-aggregate generated SQL."""
+    if _LIMIT_RE.search(sql_query) or _AGG_RE.search(sql_query):
+        return sql_query
+    return sql_query.rstrip().rstrip(';') + f" LIMIT {MAX_RESULT_ROWS}"
+
+
+# Short-TTL cache of read-query results keyed by the whitespace-normalized
+# statement, so identical generated SQL from different users (dashboards
+# asking the same question) shares one MySQL round-trip.
+_QUERY_CACHE: OrderedDict = OrderedDict()
+# execute_query runs on to_thread workers, so every cache touch (get,
+# move_to_end, insert, evict) has to happen under this lock.
+_QUERY_CACHE_LOCK = threading.Lock()
+_QUERY_CACHE_SIZE = 256
+_QUERY_CACHE_TTL = 30  # seconds; stale business numbers age out quickly
+
+
 class DatabaseManager:
     """Manages MySQL database connections and queries."""
-    
+
     @staticmethod
     def add_reminder(user_id: int, chat_id: int, message: str, remind_at: datetime) -> bool:
         """Save a new reminder to the database."""
         query = "INSERT INTO reminders (user_id, chat_id, message, remind_at) VALUES (%s, %s, %s, %s)"
-        connection = None
-        cursor = None
         try:
-            connection = mysql.connector.connect(**MYSQL_CONFIG)
-            cursor = connection.cursor()
-            cursor.execute(query, (user_id, chat_id, message, remind_at))
-            connection.commit()
+            with _conn() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(query, (user_id, chat_id, message, remind_at))
+                connection.commit()
             return True
         except Error as e:
             logger.error(f"Error adding reminder: {e}")
             return False
-        finally:
-            if connection and connection.is_connected():
-                if cursor: cursor.close()
-                connection.close()
 
     @staticmethod
-    def get_pending_reminders() -> List[dict]:
-        """Fetch reminders that are due for delivery."""
-        query = "SELECT id, chat_id, message FROM reminders WHERE status = 'pending' AND remind_at <= NOW()"
-        connection = None
-        cursor = None
+    def add_reminders_bulk(rows: List[tuple]) -> bool:
+        """Save many reminders in one round-trip.
+
+        rows are (user_id, chat_id, message, remind_at) tuples; executemany
+        folds them into a single multi-row INSERT, so N reminders cost one
+        pooled connection and one parse instead of N.
+        """
+        if not rows:
+            return True
+        query = "INSERT INTO reminders (user_id, chat_id, message, remind_at) VALUES (%s, %s, %s, %s)"
+        try:
+            with _conn() as connection:
+                with connection.cursor() as cursor:
+                    cursor.executemany(query, rows)
+                connection.commit()
+            return True
+        except Error as e:
+            logger.error(f"Error adding reminders in bulk: {e}")
+            return False
+
+    @staticmethod
+    def claim_due_reminders() -> List[dict]:
+        """Atomically fetch due reminders and mark them sent.
+
+        One transaction instead of one SELECT plus one UPDATE per row, and
+        SKIP LOCKED keeps two bot replicas from claiming the same rows.
+
+        This query runs every minute forever; give the table a composite
+        index so it stays O(due rows) instead of a full scan:
+
+            CREATE INDEX idx_reminders_pending ON reminders (status, remind_at);
+
+        The LIMIT bounds one tick's work so a backlog burst is drained
+        across cycles instead of stalling a single job run.
+        """
+        select_query = (
+            "SELECT id, chat_id, message FROM reminders "
+            "WHERE status = 'pending' AND remind_at <= NOW() "
+            "LIMIT 100 FOR UPDATE SKIP LOCKED"
+        )
         try:
-            connection = mysql.connector.connect(**MYSQL_CONFIG)
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute(query)
-            results = cursor.fetchall()
+            with _conn() as connection:
+                with connection.cursor(dictionary=True) as cursor:
+                    connection.start_transaction()
+                    cursor.execute(select_query)
+                    results = cursor.fetchall()
+                    if results:
+                        placeholders = ",".join(["%s"] * len(results))
+                        cursor.execute(
+                            f"UPDATE reminders SET status = 'sent' WHERE id IN ({placeholders})",
+                            tuple(r['id'] for r in results)
+                        )
+                connection.commit()
             return results
         except Error as e:
-            logger.error(f"Error fetching reminders: {e}")
+            logger.error(f"Error claiming reminders: {e}")
             return []
-        finally:
-            if connection and connection.is_connected():
-                if cursor: cursor.close()
-                connection.close()
 
     @staticmethod
-    def mark_reminder_sent(reminder_id: int):
-        """Mark a reminder as sent."""
-        query = "UPDATE reminders SET status = 'sent' WHERE id = %s"
-        connection = None
-        cursor = None
+    def seconds_until_next_reminder() -> Optional[float]:
+        """Seconds until the earliest pending reminder, or None if none exist.
+
+        Measured against the DB clock in the same query — the claim is gated
+        by the DB's NOW(), so using the app clock here would mis-time the
+        fire whenever the two drift apart.
+        """
         try:
-            connection = mysql.connector.connect(**MYSQL_CONFIG)
-            cursor = connection.cursor()
-            cursor.execute(query, (reminder_id,))
-            connection.commit()
+            with _conn() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT MIN(remind_at), NOW() FROM reminders WHERE status = 'pending'")
+                    row = cursor.fetchone()
+            if row is None or row[0] is None:
+                return None
+            return (row[0] - row[1]).total_seconds()
         except Error as e:
-            logger.error(f"Error marking reminder sent: {e}")
-        finally:
-            if connection and connection.is_connected():
-                if cursor: cursor.close()
-                connection.close()
+            logger.error(f"Error fetching next reminder time: {e}")
+            return None
 
     @staticmethod
     def execute_query(query: str) -> dict:
         """Execute a SQL query and return results."""
-        connection = None
-        cursor = None
+        if not _SAFE_SQL_RE.match(query):
+            return {
+                'success': False,
+                'error': 'Only read queries (SELECT/SHOW/DESCRIBE/EXPLAIN) are allowed'
+            }
+
+        cache_key = re.sub(r'\s+', ' ', query.strip())
+        now = time.monotonic()
+        with _QUERY_CACHE_LOCK:
+            hit = _QUERY_CACHE.get(cache_key)
+            if hit is not None and now - hit[0] < _QUERY_CACHE_TTL:
+                _QUERY_CACHE.move_to_end(cache_key)
+                return hit[1]
+
         try:
-            connection = mysql.connector.connect(**MYSQL_CONFIG)
-            cursor = connection.cursor(dictionary=True)
-            
-            cursor.execute(query)
-            
-            # Check if it's a SELECT query
-            if query.strip().upper().startswith('SELECT') or query.strip().upper().startswith('SHOW') or query.strip().upper().startswith('DESCRIBE'):
-                results = cursor.fetchall()
-                return {
-                    'success': True,
-                    'data': results,
-                    'row_count': len(results)
-                }
-            else:
-                connection.commit()
-                return {
-                    'success': True,
-                    'affected_rows': cursor.rowcount
-                }
-                
+            with _conn() as connection:
+                # Plain tuple cursor: dictionary=True builds a fresh dict per
+                # row, which formatters immediately flatten again anyway.
+                with connection.cursor() as cursor:
+                    cursor.execute(query)
+
+                    # Row-returning statement? Normalize the verb once instead
+                    # of three strip+upper passes. EXPLAIN and WITH (CTEs)
+                    # return rows too and must not fall into the commit branch.
+                    head = query.lstrip()[:10].upper()
+                    if head.startswith(('SELECT', 'SHOW', 'DESCRIBE', 'EXPLAIN', 'WITH')):
+                        # Second guardrail after _enforce_row_limit: never hold
+                        # more than MAX_RESULT_ROWS rows in memory.
+                        results = cursor.fetchmany(MAX_RESULT_ROWS)
+                        # Drain anything past the cap (aggregates/GROUP BY
+                        # are left unbounded, and even LIMIT 500 only sees
+                        # EOF on the next fetch) — an unread result makes
+                        # close() raise and poisons the pooled connection.
+                        while cursor.fetchmany(MAX_RESULT_ROWS):
+                            pass
+                        result = {
+                            'success': True,
+                            'columns': cursor.column_names,
+                            'data': results,
+                            'row_count': len(results)
+                        }
+                        with _QUERY_CACHE_LOCK:
+                            _QUERY_CACHE[cache_key] = (now, result)
+                            if len(_QUERY_CACHE) > _QUERY_CACHE_SIZE:
+                                _QUERY_CACHE.popitem(last=False)
+                        return result
+                    connection.commit()
+                    return {
+                        'success': True,
+                        'affected_rows': cursor.rowcount
+                    }
+
         except Error as e:
             logger.error(f"Database error: {e}")
             return {
                 'success': False,
                 'error': str(e)
             }
-        finally:
-            if connection and connection.is_connected():
-                if cursor: cursor.close()
-                connection.close()
     
     @staticmethod
     def get_table_schema() -> str:
@@ -186,42 +401,112 @@ class DatabaseManager:
         ORDER BY TABLE_NAME, ORDINAL_POSITION
         """
         
-        connection = None
-        cursor = None
         try:
-            connection = mysql.connector.connect(**MYSQL_CONFIG)
-            cursor = connection.cursor()
-            cursor.execute(schema_query, (MYSQL_CONFIG['database'],))
-            results = cursor.fetchall()
-            
-            # Format schema as text
-            schema_text = "Database Schema:\n\n"
-            current_table = None
-            
-            for table_name, column_name, data_type in results:
-                if current_table != table_name:
-                    current_table = table_name
-                    schema_text += f"\nTable: {table_name}\n"
-                schema_text += f"  - {column_name} ({data_type})\n"
-            
-            return schema_text
-            
+            with _conn() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(schema_query, (MYSQL_CONFIG['database'],))
+
+                    # Stream rows and assemble via join: repeated += on a
+                    # growing string is quadratic, and fetchall() buffers the
+                    # whole result.
+                    parts = []
+                    current_table = None
+
+                    for table_name, column_name, data_type in cursor:
+                        if current_table != table_name:
+                            current_table = table_name
+                            parts.append(f"\nTable: {table_name}")
+                        parts.append(f"  - {column_name} ({data_type})")
+            return "Database Schema:\n\n" + "\n".join(parts) + "\n"
+
         except Error as e:
             logger.error(f"Schema fetch error: {e}")
             return "Schema information unavailable"
-        finally:
-            if connection and connection.is_connected():
-                if cursor: cursor.close()
-                connection.close()
 
 
 class AIAssistant:
     """Handles AI-powered query understanding and SQL generation."""
-    
+
+    # How long the cached schema text stays valid (seconds).
+    SCHEMA_TTL = 300
+
+    # Tools the dispatcher may legally route to (mirrors the preamble).
+    KNOWN_TOOLS = frozenset({
+        'query_database', 'set_reminder', 'get_weather',
+        'convert_currency', 'generate_pdf', 'chit_chat',
+    })
+
+    # Rules half of the SQL model's system instruction; the schema half is
+    # prepended when the model is rebuilt on a schema refresh.
+    SQL_RULES = """
+
+Rules:
+1. Generate ONLY the SQL query, no explanations.
+2. Use proper MySQL syntax.
+3. For counting queries, use COUNT(*).
+4. ALWAYS append a LIMIT clause (at most 500) unless the query uses aggregate functions like COUNT/SUM/AVG.
+5. If the question is unclear, show relevant data."""
+
     def __init__(self):
-        self.schema = DatabaseManager.get_table_schema()
-        # memory[chat_id] = list of last 5 messages
-        self.memory = {}
+        # Schema is fetched lazily with a TTL so importing this module
+        # doesn't block on a database round-trip, and schema changes are
+        # picked up without a restart.
+        self._schema = None
+        self._schema_ts = 0.0
+        self._schema_lock = threading.Lock()
+        # Schema-bearing models; persona/schema live in system_instruction
+        # so each request uploads only the dynamic part. Rebuilt alongside
+        # the schema on TTL refresh.
+        self._sql_model = None
+        self._dispatch_model = None
+        # memory[chat_id] = deque of the last 10 messages (5 exchanges);
+        # maxlen makes eviction O(1) with no slicing copies. The outer dict
+        # is LRU-bounded so a long-running bot can't accumulate a window
+        # for every chat_id it has ever seen.
+        self.memory: "OrderedDict[int, deque]" = OrderedDict()
+        # LRU of recent commentary keyed by (message, result) hash; repeat
+        # questions reuse the reaction instead of a second Gemini call.
+        self._commentary_cache: OrderedDict = OrderedDict()
+        # LRU of generated SQL keyed by the whitespace-normalized question;
+        # cleared whenever the schema text changes. The clear happens on a
+        # to_thread worker (schema refresh) while lookups run on the event
+        # loop, so every touch goes through the lock.
+        self._sql_cache: OrderedDict = OrderedDict()
+        self._sql_cache_lock = threading.Lock()
+        # LRU of chit-chat replies; the prompt has no history in it, so the
+        # reply is a pure function of the message and safe to reuse.
+        self._chitchat_cache: OrderedDict = OrderedDict()
+
+    @property
+    def schema(self) -> str:
+        """Database schema text, refreshed at most every SCHEMA_TTL seconds."""
+        now = time.monotonic()
+        if self._schema is None or now - self._schema_ts > self.SCHEMA_TTL:
+            # Double-checked under a lock: the property is reached both from
+            # the event loop and from worker threads (/schema), and a cold
+            # start must not fire N concurrent INFORMATION_SCHEMA queries.
+            with self._schema_lock:
+                if self._schema is None or now - self._schema_ts > self.SCHEMA_TTL:
+                    fresh = DatabaseManager.get_table_schema()
+                    if fresh != self._schema:
+                        # Schema actually changed: cached SQL may now be invalid.
+                        with self._sql_cache_lock:
+                            self._sql_cache.clear()
+                    self._schema = fresh
+                    self._schema_ts = now
+                    self._sql_model = genai.GenerativeModel(
+                        'gemini-2.0-flash',
+                        system_instruction=(
+                            "You are a SQL expert assistant. Generate a valid "
+                            "MySQL query answering the user's question against "
+                            f"this schema.\n\n{self._schema}" + self.SQL_RULES
+                        ),
+                    )
+                    self._dispatch_model = genai.GenerativeModel(
+                        'gemini-2.0-flash',
+                        system_instruction=f"{STATIC_DISPATCH_PREAMBLE}\n\n---\n{self._schema}",
+                    )
+        return self._schema
 
     def get_history(self, chat_id: int) -> str:
         """Get the recent conversation history for a chat."""
@@ -229,94 +514,115 @@ class AIAssistant:
         if not hist: return "No previous context."
         return "\n".join([f"{m['role']}: {m['text']}" for m in hist])
 
+    MEMORY_MAX_CHATS = 10000
+
     def add_to_memory(self, chat_id: int, role: str, text: str):
         """Add a message to the chat's sliding memory window."""
-        if chat_id not in self.memory:
-            self.memory[chat_id] = []
-        self.memory[chat_id].append({'role': role, 'text': text})
-        # Keep only the last 5 exchanges (10 messages total)
-        if len(self.memory[chat_id]) > 10:
-            self.memory[chat_id] = self.memory[chat_id][-10:]
+        window = self.memory.get(chat_id)
+        if window is None:
+            window = self.memory[chat_id] = deque(maxlen=10)
+            if len(self.memory) > self.MEMORY_MAX_CHATS:
+                self.memory.popitem(last=False)
+        else:
+            self.memory.move_to_end(chat_id)
+        window.append({'role': role, 'text': text})
     
-    def dispatch(self, user_message: str, chat_id: int, audio_path: Optional[str] = None) -> dict:
+    def _fast_dispatch(self, user_message: str) -> Optional[dict]:
+        """Heuristic router for trivial intents; returns None on no match.
+
+        A matched message skips the Gemini dispatch round-trip entirely,
+        which also keeps quota free for the queries that actually need it.
+        """
+        stripped = user_message.strip()
+        if _GREETING_RE.fullmatch(stripped):
+            return {'tool': 'chit_chat', 'parameters': {},
+                    'thought': 'Greeting matched by the heuristic router; no LLM needed.'}
+
+        m = _CURRENCY_RE.fullmatch(stripped)
+        if m:
+            return {'tool': 'convert_currency',
+                    'parameters': {'amount': float(m.group(1)),
+                                   'from': m.group(2), 'to': m.group(3)},
+                    'thought': 'Currency command matched by the heuristic router.'}
+
+        m = _WEATHER_RE.fullmatch(stripped)
+        if m:
+            return {'tool': 'get_weather',
+                    'parameters': {'city': m.group(1)},
+                    'thought': 'Weather command matched by the heuristic router.'}
+        return None
+
+    async def dispatch(self, user_message: str, chat_id: int, audio_path: Optional[str] = None) -> dict:
         """Route the user request using context and intent. Supports voice."""
+        if not audio_path:
+            fast = self._fast_dispatch(user_message)
+            if fast is not None:
+                return fast
+
         current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         history = self.get_history(chat_id)
-        
-        prompt = f"""You are 'AnalystIQ', a sophisticated AI Co-Pilot for Business Operations, modeled after the 'Antigravity' architect persona.
-Current Time: {current_time}
-Conversation Context:
-{history}
-
-Your Persona:
-1. Master Strategist: You don't just answer; you architect success. Provide deep, multi-layered insights that look beyond just the raw data.
-2. Expert & Authoritative: Your tone is professional, sophisticated, and highly confident. You are a senior partner in the business.
-3. Proactive Visionary: Anticipate the next three moves. If a user asks for sales, explain the trend and suggest a visualization OR a strategic report.
-4. Outcome-Driven: Minimize technical friction. Focus entirely on boardroom-ready results and executive value.
-
-Available Tools:
-1. query_database: For ALL data questions, including charts, graphs, or visual trends.
-2. set_reminder: For setting alerts. Requires 'time' (YYYY-MM-DD HH:MM:SS) and 'message'.
-3. get_weather: For weather info. Requires 'city'.
-4. convert_currency: For exchange rates. Requires 'amount', 'from', 'to'.
-5. generate_pdf: ONLY for exporting data to a downloadable PDF document/report.
-6. chit_chat: For greetings or non-task talk.
-
-Constraint: A request for a "chart", "graph", or "plot" should go to 'query_database' UNLESS the user explicitly says "PDF" or "Report".
 
-Respond ONLY with a JSON object:
-{{
-  "tool": "tool_name",
-  "parameters": {{...}},
-  "thought": "your expert strategic reasoning, anticipating multiple future needs based on full context",
-  "transcription": "If user provided audio, include the text here"
-}}"""
+        # Persona + tools + schema live in the model's system_instruction;
+        # only the per-request context crosses the wire here. A schema
+        # cache miss queries MySQL, so keep it off the event loop.
+        await asyncio.to_thread(lambda: self.schema)
+        context_blurb = f"Current Time: {current_time}\nConversation Context:\n{history}"
 
         try:
             content_parts = []
             if audio_path:
                 # Use Gemini's multimodal support for audio
-                voice_data = pathlib.Path(audio_path).read_bytes()
+                voice_data = await asyncio.to_thread(pathlib.Path(audio_path).read_bytes)
                 content_parts.append({"mime_type": "audio/ogg", "data": voice_data})
-                content_parts.append(f"Listen to the user's voice message. {prompt}")
+                content_parts.append(f"Listen to the user's voice message. {context_blurb}")
             else:
-                content_parts.append(f"{prompt}\n\nUser Message: \"{user_message}\"")
-
-            response = model.generate_content(content_parts, generation_config={"response_mime_type": "application/json"})
-            return json.loads(response.text.strip())
+                content_parts.append(f"{context_blurb}\n\nUser Message: \"{user_message}\"")
+
+            response = await self._dispatch_model.generate_content_async(content_parts, generation_config={"response_mime_type": "application/json"})
+            decision = _json_loads(response.text)
+            # Guard against hallucinated tool names before they reach the
+            # process_decision branches.
+            if decision.get('tool') not in self.KNOWN_TOOLS:
+                decision['tool'] = 'chit_chat'
+            return decision
         except Exception as e:
             logger.error(f"Dispatch error: {e}")
             return {"tool": "query_database", "parameters": {}, "thought": "Fallback to SQL"}
 
-    def generate_sql_query(self, user_message: str) -> dict:
-        """Convert natural language to SQL query using Gemini AI."""
-        prompt = f"""You are a SQL expert assistant. Given the following database schema and user question, generate a valid MySQL query.
-
-{self.schema}
+    SQL_CACHE_SIZE = 1024
 
-User Question: {user_message}
-
-Rules:
-1. Generate ONLY the SQL query, no explanations.
-2. Use proper MySQL syntax.
-3. For counting queries, use COUNT(*).
-4. For listing queries, limit to 10 rows unless specified.
-5. If the question is unclear, show relevant data.
-
-SQL Query:"""
-
-        max_retries = 5
+    async def generate_sql_query(self, user_message: str) -> dict:
+        """Convert natural language to SQL query using Gemini AI."""
+        self.schema  # ensure schema + SQL model are fresh (may clear cache)
+
+        # Repeat questions ("how many orders today") hit the cache instead
+        # of Gemini — and never enter the 429 backoff loop at all.
+        norm_msg = re.sub(r'\s+', ' ', user_message.strip().lower())
+        with self._sql_cache_lock:
+            cached = self._sql_cache.get(norm_msg)
+            if cached is not None:
+                self._sql_cache.move_to_end(norm_msg)
+                return {'success': True, 'query': cached}
+
+        max_retries = 3
         base_delay = 2
 
         for attempt in range(max_retries):
             try:
-                response = model.generate_content(prompt)
+                response = await self._sql_model.generate_content_async(user_message)
                 sql_query = response.text.strip().replace('```sql', '').replace('```', '').strip()
+                sql_query = _enforce_row_limit(sql_query)
+                with self._sql_cache_lock:
+                    self._sql_cache[norm_msg] = sql_query
+                    if len(self._sql_cache) > self.SQL_CACHE_SIZE:
+                        self._sql_cache.popitem(last=False)
                 return {'success': True, 'query': sql_query}
             except Exception as e:
                 if "429" in str(e) and attempt < max_retries - 1:
-                    delay = (base_delay * (2 ** attempt)) + (random.uniform(0, 1))
-                    time.sleep(delay)
+                    # Full jitter: clients that hit the quota together
+                    # don't all retry together.
+                    delay = random.uniform(0, base_delay * (2 ** attempt))
+                    await asyncio.sleep(delay)
                     continue
                 return {'success': False, 'error': str(e)}
 
@@ -332,84 +638,144 @@ SQL Query:"""
         
         if len(data) == 0:
             return "📭 Nothing found in the records."
-        
-        table_output = ""
+
+        columns = query_result.get('columns', ())
+        # Build lines in a list and join once (repeated += is quadratic).
+        # Values are escaped: they end up in parse_mode='HTML' replies, so
+        # raw <, > or & in the data would otherwise break or inject markup.
+        lines = []
         for i, row in enumerate(data[:15], 1):
-            table_output += f"<b>{i}.</b> "
-            table_output += " | ".join([f"{k}: <code>{v}</code>" for k, v in row.items()])
-            table_output += "\n"
-        
+            cells = " | ".join(f"{k}: <code>{html.escape(str(v))}</code>" for k, v in zip(columns, row))
+            lines.append(f"<b>{i}.</b> {cells}")
+        lines.append("")
+
         if len(data) > 15:
-            table_output += f"\n... and {len(data) - 15} more rows"
-        
-        return table_output
+            lines.append(f"... and {len(data) - 15} more rows")
+
+        return "\n".join(lines)
+
+    COMMENTARY_CACHE_SIZE = 256
 
-    def generate_commentary(self, user_message: str, result_text: str, chat_id: int) -> dict:
+    async def generate_commentary(self, user_message: str, result_text: str, chat_id: int) -> dict:
         """Generate an expert reaction + a smart proactive suggestion if useful."""
+        # Empty results, write acks and errors have nothing to analyze;
+        # skip the Gemini round-trip and hand the text back as-is.
+        if len(result_text) < 40 or result_text.startswith(('📭', '✅ Done', '❌')):
+            return {"insight": result_text, "full_display": result_text}
+
+        cache_key = hashlib.blake2b(
+            f"{user_message}\x00{result_text}".encode(), digest_size=16).digest()
+        cached = self._commentary_cache.get(cache_key)
+        if cached is not None:
+            self._commentary_cache.move_to_end(cache_key)
+            return cached
+
         history = self.get_history(chat_id)
+        # Static rules lead, dynamic context trails — keeps the cacheable
+        # prompt prefix identical across calls.
         prompt = f"""You are 'AnalystIQ', an expert AI business partner with the 'Antigravity' persona.
-History: {history}
-User asked: "{user_message}"
-Result: {result_text}
 
 Rules:
 1. Expert Commentary: Provide a sophisticated, high-level business analysis of the result. Do not just repeat the data; interpret it for a CEO.
 2. Authoritative Tone: Maintain a professional and confident persona.
-3. Strategic Proactivity: Anticipate the next move. Suggest visualizations, PDF reports, or deeper data deep-dives. 
+3. Strategic Proactivity: Anticipate the next move. Suggest visualizations, PDF reports, or deeper data deep-dives.
 4. Maximize Value: You now have the space to give comprehensive, strategic advice. Use it to help the user lead.
 5. Suggestion format: "Strategic Insight: [Your expert proactive suggestion]"
 
+---
+History: {history}
+User asked: "{user_message}"
+Result: {result_text}
+
 Response:"""
         try:
-            response = model.generate_content(prompt, generation_config={"max_output_tokens": 1024})
+            response = await model.generate_content_async(prompt, generation_config={"max_output_tokens": 1024})
             insight = response.text.strip()
             display_text = f"🌌 {html.escape(insight)}\n\n{result_text}\n\n<i>— Your Partner, AnalystIQ (Powered by Antigravity v7.3)</i>"
-            return {
+            result = {
                 "insight": insight,
                 "full_display": display_text
             }
+            self._commentary_cache[cache_key] = result
+            if len(self._commentary_cache) > self.COMMENTARY_CACHE_SIZE:
+                self._commentary_cache.popitem(last=False)
+            return result
         except:
             return {
                 "insight": "Data analysis complete. Please review the detailed records below.",
                 "full_display": result_text
             }
 
+    # One compiled alternation beats seven substring scans over a fresh
+    # .lower() copy of the message.
+    _CHART_RE = re.compile(r'\b(chart|graph|plot|visuali[sz]e|trend|pie)\b', re.IGNORECASE)
+
     def is_chart_requested(self, user_message: str) -> bool:
-        keywords = ['chart', 'graph', 'plot', 'visualize', 'trend', 'pie', 'bar chart']
-        return any(k in user_message.lower() for k in keywords)
+        return bool(self._CHART_RE.search(user_message))
+
+    CHITCHAT_CACHE_SIZE = 256
+
+    async def chitchat_reply(self, user_message: str) -> str:
+        """Persona reply for non-task talk, memoized on the normalized message."""
+        key = re.sub(r'\s+', ' ', user_message.strip().lower())
+        cached = self._chitchat_cache.get(key)
+        if cached is not None:
+            self._chitchat_cache.move_to_end(key)
+            return cached
 
-    def create_chart(self, user_message: str, data: List[Dict[str, Any]]) -> Optional[bytes]:
+        prompt = f"Respond as 'AnalystIQ', a sophisticated AI business partner with the 'Antigravity' persona. Provide deep, expert-level strategic advice and proactive support. User says: {user_message}"
+        res = await model.generate_content_async(prompt, generation_config={"max_output_tokens": 1024})
+        text = res.text
+        self._chitchat_cache[key] = text
+        if len(self._chitchat_cache) > self.CHITCHAT_CACHE_SIZE:
+            self._chitchat_cache.popitem(last=False)
+        return text
+
+    def create_chart(self, user_message: str, data: List[tuple], columns: List[str]) -> Optional[bytes]:
         try:
             if not data: return None
-            df = pd.DataFrame(data)
+            df = pd.DataFrame(data, columns=list(columns))
+            # Coerce each column and adopt it unless coercion mangled a real
+            # value — NaN is fine where the source was already NULL (DECIMAL
+            # columns with NULLs arrive as object dtype). errors='ignore'
+            # used to do this in one pass but is gone in pandas 3.0.
             for col in df.columns:
-                try: df[col] = pd.to_numeric(df[col])
-                except: continue
+                coerced = pd.to_numeric(df[col], errors='coerce')
+                if (coerced.notna() | df[col].isna()).all():
+                    df[col] = coerced
             num_cols = df.select_dtypes(include=['number']).columns.tolist()
             str_cols = df.select_dtypes(exclude=['number']).columns.tolist()
             if not num_cols: return None
             
             label_col = str_cols[0] if str_cols else df.columns[0]
             value_col = num_cols[0]
-            
-            plt.figure(figsize=(10, 6))
-            if 'pie' in user_message.lower():
-                plt.pie(df[value_col], labels=df[label_col], autopct='%1.1f%%', colors=plt.cm.Paired.colors)
-                plt.axis('equal')
-            elif 'line' in user_message.lower() or 'trend' in user_message.lower():
-                plt.plot(df[label_col], df[value_col], marker='o', linestyle='-', color='skyblue', linewidth=2)
-                plt.xticks(rotation=45)
-                plt.grid(True, linestyle='--', alpha=0.6)
-            else:
-                plt.bar(df[label_col], df[value_col], color='skyblue')
-                plt.xticks(rotation=45)
-                plt.grid(axis='y', linestyle='--', alpha=0.6)
-            
-            plt.title(f"{value_col} by {label_col}", fontsize=14, fontweight='bold')
-            plt.tight_layout()
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', dpi=150)
-            plt.close()
+            msg_lc = user_message.lower()
+
+            with _FIG_LOCK:
+                # clear() the persistent axes instead of clf()+add_subplot:
+                # no axes reallocation, and pie() skews the aspect so reset it.
+                ax = _AX
+                ax.clear()
+                ax.set_aspect('auto')
+                if 'pie' in msg_lc:
+                    ax.pie(df[value_col], labels=df[label_col], autopct='%1.1f%%', colors=plt.cm.Paired.colors)
+                    ax.axis('equal')
+                elif 'line' in msg_lc or 'trend' in msg_lc:
+                    ax.plot(df[label_col], df[value_col], marker='o', linestyle='-', color='skyblue', linewidth=2)
+                    ax.tick_params(axis='x', rotation=45)
+                    ax.grid(True, linestyle='--', alpha=0.6)
+                else:
+                    ax.bar(df[label_col], df[value_col], color='skyblue')
+                    ax.tick_params(axis='x', rotation=45)
+                    ax.grid(axis='y', linestyle='--', alpha=0.6)
+
+                ax.set_title(f"{value_col} by {label_col}", fontsize=14, fontweight='bold')
+                _FIG.tight_layout()
+                buf = io.BytesIO()
+                # Default figure dpi (100): Telegram displays ~800px wide,
+                # so the old dpi=150 rasterized and compressed more than
+                # twice the pixels anyone ever saw.
+                _CANVAS.print_png(buf)
             buf.seek(0)
             return buf.getvalue()
         except Exception as e:
@@ -421,12 +787,12 @@ class AssistantTools:
     """Helper tools for the Personal Assistant."""
 
     @staticmethod
-    def get_weather(city: str) -> str:
+    async def get_weather(city: str) -> str:
         if not WEATHER_API_KEY:
             return "Maaf karna bro, Weather API key is missing in settings."
         try:
             url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={WEATHER_API_KEY}&units=metric"
-            r = requests.get(url).json()
+            r = (await _HTTP.get(url)).json()
             if r.get('cod') != 200: return f"City '{city}' nahi mili bro."
             temp = r['main']['temp']
             desc = r['weather'][0]['description']
@@ -435,10 +801,10 @@ class AssistantTools:
             return "Mausam check karne mein thoda issue aa gaya."
 
     @staticmethod
-    def convert_currency(amount: float, from_curr: str, to_curr: str) -> str:
+    async def convert_currency(amount: float, from_curr: str, to_curr: str) -> str:
         try:
             url = f"https://api.frankfurter.app/latest?amount={amount}&from={from_curr}&to={to_curr}"
-            r = requests.get(url).json()
+            r = (await _HTTP.get(url)).json()
             val = r['rates'][to_curr.upper()]
             return f"💵 {amount} {from_curr.upper()} is about <b>{val:.2f} {to_curr.upper()}</b> right now."
         except:
@@ -477,12 +843,11 @@ class PDFReport(FPDF):
         self.multi_cell(0, 7, body)
         self.ln(5)
 
-    def draw_table(self, data):
+    def draw_table(self, data, columns):
         if not data: return
-        
-        # Get column names from the first dictionary
-        headers = list(data[0].keys())
-        
+
+        headers = list(columns)
+
         self.set_font("helvetica", "B", 10)
         self.set_fill_color(240, 240, 240)
         self.set_text_color(0, 0, 0)
@@ -495,19 +860,21 @@ class PDFReport(FPDF):
             self.cell(col_width, 10, str(header).upper(), border=1, align="C", fill=True)
         self.ln()
         
-        # Render Rows
+        # Render Rows. Stringify every cell up front in one comprehension;
+        # the render loop then only does fpdf cell() calls.
+        str_rows = [[str(value) for value in row] for row in data]
         self.set_font("helvetica", size=9)
         fill = False
-        for row in data:
+        for row_vals in str_rows:
             self.set_fill_color(250, 250, 250) if fill else self.set_fill_color(255, 255, 255)
-            for header in headers:
-                self.cell(col_width, 8, str(row.get(header, "")), border=1, align="C", fill=True)
+            for value in row_vals:
+                self.cell(col_width, 8, value, border=1, align="C", fill=True)
             self.ln()
             fill = not fill
         self.ln(10)
 
     @staticmethod
-    def generate_report(title: str, summary: str, data_list: List[dict], chart_bytes: Optional[bytes] = None) -> bytes:
+    def generate_report(title: str, summary: str, data_list: List[tuple], columns: List[str], chart_bytes: Optional[bytes] = None) -> bytes:
         pdf = PDFReport()
         pdf.add_page()
         
@@ -519,19 +886,15 @@ class PDFReport(FPDF):
         # 2. Visual Intelligence (Chart)
         if chart_bytes:
             pdf.chapter_title("VISUAL INTELLIGENCE")
-            img_path = f"temp_chart_{int(time.time())}.png"
-            with open(img_path, "wb") as f:
-                f.write(chart_bytes)
-            # Center the image
-            pdf.image(img_path, x=25, w=160)
+            # fpdf2 accepts a file-like object directly — no temp file on
+            # disk, and no filename race between concurrent reports.
+            pdf.image(io.BytesIO(chart_bytes), x=25, w=160)  # centered
             pdf.ln(5)
-            if os.path.exists(img_path):
-                os.remove(img_path)
             pdf.add_page() # Start data on fresh page if there's a chart
 
         # 3. Detailed Data Analytics (Table)
         pdf.chapter_title("DETAILED DATA ANALYTICS")
-        pdf.draw_table(data_list)
+        pdf.draw_table(data_list, columns)
         
         return pdf.output()
 
@@ -540,16 +903,54 @@ class PDFReport(FPDF):
 ai_assistant = AIAssistant()
 tools = AssistantTools()
 
+_REMINDER_JOB_NAME = "reminder_fire"
+
+
+async def reschedule_reminder_job(job_queue):
+    """Point the single reminder job at the next pending fire time.
+
+    The reminders table is the priority queue (MIN(remind_at) is its top),
+    so instead of sweeping every minute the job runs exactly when the next
+    reminder is due. The delay is never longer than the 300s sweep (rows
+    inserted by other processes must not wait behind a far-future armed
+    reminder) and never shorter than 1s (an already-due row that the DB
+    clock hasn't admitted yet would otherwise re-arm in a tight loop).
+    """
+    for job in job_queue.get_jobs_by_name(_REMINDER_JOB_NAME):
+        job.schedule_removal()
+
+    secs = await asyncio.to_thread(DatabaseManager.seconds_until_next_reminder)
+    if secs is not None:
+        delay = min(max(1.0, secs), 300.0)
+    else:
+        # Nothing pending: scheduling a reminder re-arms the job
+        # immediately, so the idle sweep only exists to catch rows
+        # inserted by other processes (and DB blips) and can be slow.
+        delay = 300.0
+    job_queue.run_once(check_reminders_job, when=delay, name=_REMINDER_JOB_NAME)
+
+
 async def check_reminders_job(context: ContextTypes.DEFAULT_TYPE):
-    """Background task to send reminders (JobQueue version)."""
-    pending = DatabaseManager.get_pending_reminders()
-    for rem in pending:
-        try:
-            msg = f"⏰ <b>BHOOLNA MAT BRO!</b>\n\n{rem['message']}\n\n<i>— Task Yaad Dilaya by AnalystIQ</i>"
-            await context.bot.send_message(chat_id=rem['chat_id'], text=msg, parse_mode='HTML')
-            DatabaseManager.mark_reminder_sent(rem['id'])
-        except Exception as e:
-            logger.error(f"Failed to send reminder {rem['id']}: {e}")
+    """Send due reminders, then re-arm for the next fire time."""
+    pending = await asyncio.to_thread(DatabaseManager.claim_due_reminders)
+    await reschedule_reminder_job(context.job_queue)
+    if not pending:
+        return
+
+    # Claiming already marked the batch sent in one UPDATE; the sends are
+    # independent Telegram calls, so fire them concurrently instead of
+    # paying one API round-trip after another.
+    tasks = [
+        context.bot.send_message(
+            chat_id=rem['chat_id'],
+            text=f"⏰ <b>BHOOLNA MAT BRO!</b>\n\n{rem['message']}\n\n<i>— Task Yaad Dilaya by AnalystIQ</i>",
+            parse_mode='HTML')
+        for rem in pending
+    ]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for rem, result in zip(pending, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to send reminder {rem['id']}: {result}")
 
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -586,7 +987,9 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def schema_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /schema command."""
-    schema = DatabaseManager.get_table_schema()
+    # Served from the assistant's TTL cache; only a cache miss touches
+    # INFORMATION_SCHEMA (hence the worker thread).
+    schema = await asyncio.to_thread(lambda: ai_assistant.schema)
     await update.message.reply_text(f"```\n{schema}\n```", parse_mode='Markdown')
 
 
@@ -604,7 +1007,7 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await file.download_to_drive(temp_path)
     
     # Ask the Dispatcher to 'hear' the message
-    decision = ai_assistant.dispatch("", chat_id, audio_path=temp_path)
+    decision = await ai_assistant.dispatch("", chat_id, audio_path=temp_path)
     
     # Transcribed text (if provided by AI)
     transcription = decision.get('transcription', "Voice Message")
@@ -625,11 +1028,40 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.chat.send_action(action="typing")
     
     # 1. Ask the Dispatcher what to do (using memory)
-    decision = ai_assistant.dispatch(user_message, chat_id)
+    decision = await ai_assistant.dispatch(user_message, chat_id)
     await process_decision(update, context, decision, user_message)
 
 
+# Per-chat locks: replies within one chat arrive in ask order, while
+# different chats still run fully concurrently.
+_CHAT_LOCKS: Dict[int, asyncio.Lock] = {}
+_CHAT_LOCKS_MAX = 10000
+
+# Per-user in-flight cap: with concurrent updates enabled, one user
+# flooding the bot queues on their own semaphore instead of saturating
+# the loop (and the Gemini/MySQL backends) for everyone else.
+_USER_SEMS: Dict[int, asyncio.Semaphore] = {}
+_USER_MAX_INFLIGHT = 4
+_USER_SEMS_MAX = 10000
+
+
 async def process_decision(update: Update, context: ContextTypes.DEFAULT_TYPE, decision: dict, user_message: str):
+    """Process an AI decision, serialized per chat (shared by text and voice)."""
+    chat_id = update.effective_chat.id
+    user_id = update.effective_user.id
+    if len(_USER_SEMS) >= _USER_SEMS_MAX:
+        _USER_SEMS.clear()
+    if len(_CHAT_LOCKS) >= _CHAT_LOCKS_MAX:
+        # Same crude cap as the semaphores: in-flight holders keep their
+        # lock object alive; only idle chats lose theirs.
+        _CHAT_LOCKS.clear()
+    sem = _USER_SEMS.setdefault(user_id, asyncio.Semaphore(_USER_MAX_INFLIGHT))
+    async with sem:
+        async with _CHAT_LOCKS.setdefault(chat_id, asyncio.Lock()):
+            await _process_decision(update, context, decision, user_message)
+
+
+async def _process_decision(update: Update, context: ContextTypes.DEFAULT_TYPE, decision: dict, user_message: str):
     """Core logic to process an AI decision (shared by text and voice)."""
     chat_id = update.effective_chat.id
     user_id = update.effective_user.id
@@ -640,13 +1072,17 @@ async def process_decision(update: Update, context: ContextTypes.DEFAULT_TYPE, d
     # Store user message in memory
     ai_assistant.add_to_memory(chat_id, "User", user_message)
     
-    logger.info(f"User {user_id} -> Tool: {tool} | Thought: {decision.get('thought')}")
+    # %-style args defer formatting until the record is actually emitted.
+    logger.info("User %s -> Tool: %s | Thought: %s", user_id, tool, decision.get('thought'))
 
     final_text = ""
     if tool == 'set_reminder':
         try:
             remind_time = datetime.strptime(params['time'], "%Y-%m-%d %H:%M:%S")
-            if DatabaseManager.add_reminder(user_id, chat_id, params['message'], remind_time):
+            if await asyncio.to_thread(DatabaseManager.add_reminder, user_id, chat_id, params['message'], remind_time):
+                # The new reminder may be due before the currently armed one.
+                if context.job_queue:
+                    await reschedule_reminder_job(context.job_queue)
                 final_text = f"✅ Theek hai bro, scheduled: <i>{params['message']}</i> for <b>{params['time']}</b>."
             else:
                 final_text = "❌ Reminder set karne mein koi locha ho gaya."
@@ -655,49 +1091,71 @@ async def process_decision(update: Update, context: ContextTypes.DEFAULT_TYPE, d
         await update.message.reply_text(final_text, parse_mode='HTML')
 
     elif tool == 'get_weather':
-        final_text = tools.get_weather(params.get('city', 'Mumbai'))
+        final_text = await tools.get_weather(params.get('city', 'Mumbai'))
         await update.message.reply_text(final_text)
 
     elif tool == 'convert_currency':
-        final_text = tools.convert_currency(params.get('amount', 1), params.get('from', 'USD'), params.get('to', 'INR'))
+        final_text = await tools.convert_currency(
+            params.get('amount', 1), params.get('from', 'USD'), params.get('to', 'INR'))
         await update.message.reply_text(final_text, parse_mode='HTML')
 
-    elif tool == 'query_database' or tool == 'generate_pdf':
-        sql_result = ai_assistant.generate_sql_query(user_message)
+    elif tool in ('query_database', 'generate_pdf'):
+        # Fused call: when the dispatcher already produced SQL, skip the
+        # dedicated generation round-trip. It gets the same guardrails as
+        # generated SQL; anything suspect falls back to the full path.
+        fused_sql = decision.get('sql')
+        if fused_sql and _SAFE_SQL_RE.match(fused_sql):
+            sql_result = {'success': True, 'query': _enforce_row_limit(fused_sql)}
+        else:
+            sql_result = await ai_assistant.generate_sql_query(user_message)
         if not sql_result.get('success'):
             final_text = f"❌ Samajhna thoda mushkil hai: {sql_result.get('error')}"
             await update.message.reply_text(final_text)
             return
-        
-        db_res = DatabaseManager.execute_query(sql_result['query'])
+
+        # mysql.connector stays blocking; keep it on a worker thread so a
+        # slow query doesn't stall the event loop for every other chat.
+        db_res = await asyncio.to_thread(DatabaseManager.execute_query, sql_result['query'])
         raw_data = ai_assistant.format_response(user_message, db_res)
-        commentary_obj = ai_assistant.generate_commentary(user_message, raw_data, chat_id)
+        db_data = db_res.get('data', [])
+        db_columns = db_res.get('columns', ())
+
+        chart = None
+        # Zero rows or a lone scalar (COUNT-style answers): nothing worth a
+        # Gemini reaction, so synthesize the commentary locally.
+        if not db_data or (len(db_data) == 1 and len(db_data[0]) == 1):
+            insight = ("No records matched — consider broadening the filters."
+                       if not db_data else
+                       "Single-figure result; the number below is the answer.")
+            commentary_obj = {'insight': insight, 'full_display': raw_data}
+        # Commentary (LLM) and chart rendering (matplotlib worker thread)
+        # are independent once the rows are in hand — overlap them so the
+        # wait is max(LLM, chart) instead of the sum.
+        elif ai_assistant.is_chart_requested(user_message):
+            commentary_obj, chart = await asyncio.gather(
+                ai_assistant.generate_commentary(user_message, raw_data, chat_id),
+                asyncio.to_thread(ai_assistant.create_chart, user_message, db_data, db_columns))
+        else:
+            commentary_obj = await ai_assistant.generate_commentary(user_message, raw_data, chat_id)
         final_text = commentary_obj['full_display']
 
         if tool == 'generate_pdf':
-            chart = None
-            db_data = db_res.get('data', [])
-            if ai_assistant.is_chart_requested(user_message):
-                chart = ai_assistant.create_chart(user_message, db_data)
-            
-            # Pass ONLY the clean AI insights to the PDF summary
-            pdf_bytes = PDFReport.generate_report("Business Report by AnalystIQ", commentary_obj['insight'], db_data, chart)
+            # Pass ONLY the clean AI insights to the PDF summary; matplotlib
+            # and fpdf are CPU-bound, keep them off the event loop
+            pdf_bytes = await asyncio.to_thread(
+                PDFReport.generate_report, "Business Report by AnalystIQ", commentary_obj['insight'], db_data, db_columns, chart)
             buf = io.BytesIO(pdf_bytes)
             buf.name = f"report_{datetime.now().strftime('%H%M%S')}.pdf"
             await update.message.reply_document(document=buf, caption="📂 Your Professional Executive Report is ready!")
         else:
-            if ai_assistant.is_chart_requested(user_message):
-                chart = ai_assistant.create_chart(user_message, db_res.get('data'))
-                if chart:
-                    await update.message.reply_photo(photo=chart, caption=final_text, parse_mode='HTML')
-                    ai_assistant.add_to_memory(chat_id, "AnalystIQ", final_text)
-                    return
+            if chart:
+                await update.message.reply_photo(photo=chart, caption=final_text, parse_mode='HTML')
+                ai_assistant.add_to_memory(chat_id, "AnalystIQ", final_text)
+                return
             await update.message.reply_text(final_text, parse_mode='HTML')
 
     else: # chit_chat
-        prompt = f"Respond as 'AnalystIQ', a sophisticated AI business partner with the 'Antigravity' persona. Provide deep, expert-level strategic advice and proactive support. User says: {user_message}"
-        res = model.generate_content(prompt, generation_config={"max_output_tokens": 1024})
-        final_text = res.text
+        final_text = await ai_assistant.chitchat_reply(user_message)
         await update.message.reply_text(final_text)
 
     # Store assistant response in memory
@@ -729,8 +1187,25 @@ def main():
     logger.info("Starting Telegram AI Business Assistant Bot v3.0...")
     logger.info(f"Targeting MySQL Database: {MYSQL_CONFIG['database']} on {MYSQL_CONFIG['host']}")
     
-    # Build application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    # Build application. concurrent_updates lets handlers for different
+    # updates run as parallel tasks instead of serializing the queue;
+    # per-chat ordering is preserved by the locks in process_decision.
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(True)
+        # HTTP/2 multiplexes concurrent sends over one TLS connection and
+        # the larger pool keeps burst replies from queueing on a socket;
+        # getUpdates stays on its own single long-poll connection.
+        .request(ORJSONRequest(
+            connection_pool_size=256,
+            http_version="2",
+            read_timeout=20,
+            write_timeout=20,
+        ))
+        .get_updates_request(ORJSONRequest(http_version="2"))
+        .build()
+    )
     
     # Add handlers
     application.add_handler(CommandHandler("start", start_command))
@@ -738,48 +1213,136 @@ def main():
     application.add_handler(CommandHandler("schema", schema_command))
     
     # Whitelisting Guard
+    # Note: Bots only get phone if the user shares their contact, but we
+    # can match by username/ID as a reliable proxy. Entries are normalized
+    # once here; the per-message check is a single set lookup. An empty
+    # whitelist means open access.
     whitelist = config.get('WHITELIST', [])
-    
+    # Entries prefixed with '~' opt into typo-tolerant matching; everything
+    # else is exact. Exact membership is always tried first, so the fuzzy
+    # comparison only ever runs for unknown identifiers.
+    exact_entries = frozenset(
+        e.replace("@", "").strip().casefold() for e in whitelist if not e.startswith("~"))
+    fuzzy_entries = tuple(
+        e[1:].replace("@", "").strip().casefold() for e in whitelist if e.startswith("~"))
+
+    def is_allowed(identifier: str) -> bool:
+        if not whitelist:
+            return True  # Default to open if no whitelist set
+        if identifier in exact_entries:
+            return True
+        return any(
+            _similarity(identifier, entry) >= 0.9
+            for entry in fuzzy_entries)
+
+    # Decision cache: repeat messages from the same user skip the whitelist
+    # check (which may include fuzzy scoring) for five minutes. The
+    # whitelist itself is read once at startup, so edits to it need a
+    # restart regardless; the TTL just bounds the cache's staleness against
+    # username changes.
+    auth_cache: Dict[int, tuple] = {}
+    AUTH_TTL = 300
+    AUTH_CACHE_MAX = 10000
+
     async def restricted_handler(update, context):
         user = update.effective_user
-        # Try to match username or phone if available
-        # Note: Bots only get phone if the user shares their contact, 
-        # but we can match by username/ID as a reliable proxy.
-        # Here we match against the string provided in the Whitelist settings.
-        allowed = False
-        if not whitelist:
-            allowed = True # Default to open if no whitelist set
+        identifier = (user.username or str(user.id)).casefold()
+
+        now = time.monotonic()
+        cached = auth_cache.get(user.id)
+        if cached is not None and now - cached[1] < AUTH_TTL:
+            allowed = cached[0]
         else:
-            identifier = user.username or str(user.id)
-            for entry in whitelist:
-                # Basic fuzzy match for ID or Username
-                if entry.replace("@", "").strip().lower() == identifier.lower():
-                    allowed = True
-                    break
-        
+            allowed = is_allowed(identifier)
+            if len(auth_cache) >= AUTH_CACHE_MAX:
+                auth_cache.clear()
+            auth_cache[user.id] = (allowed, now)
+
         if allowed:
             if update.message.voice:
                 await handle_voice(update, context)
             else:
                 await handle_message(update, context)
         else:
-            logger.warning(f"Unauthorized access attempt by {identifier}")
-            await update.message.reply_text("🔒 Access Restricted. You are not on the authorized whitelist.")
+            await deny_handler(update, context)
+
+    # Denial replies cost a Telegram API call each; repeat offenders get
+    # one per hour and only a cheap log line in between.
+    denied_replied: Dict[int, float] = {}
+    DENY_REPLY_TTL = 3600
 
-    application.add_handler(MessageHandler((filters.TEXT & ~filters.COMMAND) | filters.VOICE, restricted_handler))
+    async def deny_handler(update, context):
+        user = update.effective_user
+        logger.warning("Unauthorized access attempt by %s", user.username or user.id)
+        now = time.monotonic()
+        last = denied_replied.get(user.id)
+        if last is not None and now - last < DENY_REPLY_TTL:
+            return
+        if len(denied_replied) >= AUTH_CACHE_MAX:
+            denied_replied.clear()
+        denied_replied[user.id] = now
+        await update.message.reply_text("🔒 Access Restricted. You are not on the authorized whitelist.")
+
+    # Voice and text get their own registrations: the dispatcher's compiled
+    # filters pick the handler, replacing the per-message Python branch on
+    # update.message.voice.
+    text_filter = filters.TEXT & ~filters.COMMAND
+    if not whitelist:
+        application.add_handler(MessageHandler(filters.VOICE, handle_voice))
+        application.add_handler(MessageHandler(text_filter, handle_message))
+    elif not fuzzy_entries and all(e.lstrip('-').isdigit() for e in exact_entries):
+        # All-numeric whitelist: let PTB's set-backed filters.User gate the
+        # update inside the dispatcher, so unauthorized traffic never
+        # reaches Python handler code. Handlers in the same group are tried
+        # in order, so the plain-filter deny handler only sees the rest.
+        # Username entries can't take this path — filters.User compares
+        # usernames case-sensitively, while ours are casefolded.
+        auth = filters.User(user_id={int(e) for e in exact_entries})
+        application.add_handler(MessageHandler(filters.VOICE & auth, handle_voice))
+        application.add_handler(MessageHandler(text_filter & auth, handle_message))
+        application.add_handler(MessageHandler(text_filter | filters.VOICE, deny_handler))
+    else:
+        # Username or fuzzy entries need the case-insensitive (and possibly
+        # scored) runtime check.
+        application.add_handler(MessageHandler(text_filter | filters.VOICE, restricted_handler))
     
     # Add error handler
     application.add_error_handler(error_handler)
     
-    # Start JobQueue for reminders
+    # Arm the reminder job; it reschedules itself to the next due time.
     if application.job_queue:
-        application.job_queue.run_repeating(check_reminders_job, interval=60, first=10)
+        application.job_queue.run_once(check_reminders_job, when=10, name=_REMINDER_JOB_NAME)
     else:
         logger.warning("JobQueue not available. Reminders will not work.")
 
-    # Start the bot
-    logger.info("Bot is running! Press Ctrl+C to stop.")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    # Start the bot. With a public webhook URL configured, Telegram pushes
+    # updates to us directly — no getUpdates long-poll latency. Without one
+    # (local dev) we fall back to polling.
+    webhook_url = config.get('TELEGRAM_WEBHOOK_URL', os.getenv('TELEGRAM_WEBHOOK_URL'))
+    if webhook_url:
+        # TLS is expected to terminate at a reverse proxy (nginx/Caddy) in
+        # front of this listener. The local path is the bot token, so the
+        # endpoint isn't guessable even without a secret token configured.
+        url_path = TELEGRAM_BOT_TOKEN
+        logger.info("Bot is running via webhook.")
+        application.run_webhook(
+            listen="0.0.0.0",
+            port=int(os.getenv("PORT", 8443)),
+            url_path=url_path,
+            webhook_url=f"{webhook_url.rstrip('/')}/{url_path}",
+            secret_token=os.getenv("TELEGRAM_WEBHOOK_SECRET"),
+            allowed_updates=Update.ALL_TYPES,
+        )
+    else:
+        logger.info("Bot is running (long polling)! Press Ctrl+C to stop.")
+        # Hold each getUpdates open for the Telegram maximum and re-poll
+        # immediately: near-instant delivery, no empty round-trips.
+        application.run_polling(
+            allowed_updates=Update.ALL_TYPES,
+            timeout=30,
+            poll_interval=0.0,
+            bootstrap_retries=-1,
+        )
 
 
 if __name__ == '__main__':